@@ -1,18 +1,23 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 from reportlab.lib.pagesizes import landscape
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Spacer, Paragraph, PageBreak, Image
+from reportlab.pdfgen.canvas import Canvas
 from reportlab.lib.units import cm, inch
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
-from reportlab.lib.utils import ImageReader
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from io import BytesIO
 import subprocess
 import sys
-import re
-import tempfile
+import functools
+import pickle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
 # Define sticker dimensions - Fixed as per original code
 STICKER_WIDTH = 10 * cm
@@ -29,6 +34,68 @@ COLUMN_WIDTH_PROPORTIONS = [1.0, 1.9, 0.8, 0.8, 0.7, 0.7, 0.8]
 # Fixed content positioning
 CONTENT_LEFT_OFFSET = 1.4 * cm
 
+# Fixed row heights as per original
+HEADER_ROW_HEIGHT = 0.6 * cm
+DESC_ROW_HEIGHT = 0.8 * cm
+QTY_ROW_HEIGHT = 0.5 * cm
+LOCATION_ROW_HEIGHT = 0.5 * cm
+TOTAL_MAIN_HEIGHT = HEADER_ROW_HEIGHT + DESC_ROW_HEIGHT + QTY_ROW_HEIGHT
+
+# Fixed column widths derived from the content box
+QR_WIDTH = 1.5 * cm
+MAIN_CONTENT_WIDTH = CONTENT_BOX_WIDTH - QR_WIDTH
+HEADER_COL_W = MAIN_CONTENT_WIDTH * 0.22
+CONTENT_COL_W = MAIN_CONTENT_WIDTH * 0.71
+INNER_COL_WIDTHS = tuple(w * CONTENT_COL_W / sum(COLUMN_WIDTH_PROPORTIONS) for w in COLUMN_WIDTH_PROPORTIONS)
+
+# Flat sticker grid: label column, 7 location boxes, a gap and the QR column spanning the content box
+QR_GAP_WIDTH = MAIN_CONTENT_WIDTH - HEADER_COL_W - CONTENT_COL_W
+STICKER_COL_WIDTHS = (HEADER_COL_W,) + INNER_COL_WIDTHS + (QR_GAP_WIDTH, QR_WIDTH)
+STICKER_ROW_HEIGHTS = (HEADER_ROW_HEIGHT, DESC_ROW_HEIGHT, QTY_ROW_HEIGHT, LOCATION_ROW_HEIGHT,
+                       LOCATION_ROW_HEIGHT, CONTENT_BOX_HEIGHT - TOTAL_MAIN_HEIGHT - 2 * LOCATION_ROW_HEIGHT)
+
+# Distance from the top of the page to the content box
+CONTENT_TOP_OFFSET = 0.8 * cm
+
+# Content box corner and the cell edges of the sticker grid, in page coordinates
+CONTENT_BOX_LEFT = CONTENT_LEFT_OFFSET
+CONTENT_BOX_TOP = STICKER_HEIGHT - CONTENT_TOP_OFFSET
+STICKER_COL_X = tuple(CONTENT_BOX_LEFT + sum(STICKER_COL_WIDTHS[:i]) for i in range(len(STICKER_COL_WIDTHS) + 1))
+STICKER_ROW_Y = tuple(CONTENT_BOX_TOP - sum(STICKER_ROW_HEIGHTS[:i]) for i in range(len(STICKER_ROW_HEIGHTS) + 1))
+
+# Descriptions are cut to this many characters on the sticker (the QR code keeps the full text)
+DESC_MAX_CHARS = 30
+
+# Horizontal padding inside each cell
+CELL_PADDING = 6
+
+def cell_box(col_start, col_end, row_start, row_end):
+    """Return (left, right, middle) of the text area of a cell spanning the given grid columns and rows"""
+    return (STICKER_COL_X[col_start] + CELL_PADDING,
+            STICKER_COL_X[col_end] - CELL_PADDING,
+            (STICKER_ROW_Y[row_start] + STICKER_ROW_Y[row_end]) / 2)
+
+# Fixed cells - values span the 7 location box columns, the QR code spans the whole content box height
+PART_NO_LABEL_CELL = cell_box(0, 1, 0, 1)
+DESC_LABEL_CELL = cell_box(0, 1, 1, 2)
+QTY_LABEL_CELL = cell_box(0, 1, 2, 3)
+STORE_LOC_LABEL_CELL = cell_box(0, 1, 3, 4)
+LINE_LOC_LABEL_CELL = cell_box(0, 1, 4, 5)
+PART_NO_CELL = cell_box(1, 8, 0, 1)
+DESC_CELL = cell_box(1, 8, 1, 2)
+QTY_CELL = cell_box(1, 8, 2, 3)
+STORE_LOC_CELLS = tuple(cell_box(i, i + 1, 3, 4) for i in range(1, 8))
+LINE_LOC_CELLS = tuple(cell_box(i, i + 1, 4, 5) for i in range(1, 8))
+QR_CELL = cell_box(9, 10, 0, 6)
+
+# QR image position - centred between the grid and the border box, so neither line touches its quiet zone
+QR_SIZE = 1.5 * cm
+QR_X = (STICKER_COL_X[8] + STICKER_COL_X[10] - QR_SIZE) / 2
+QR_Y = CONTENT_BOX_TOP - (CONTENT_BOX_HEIGHT + QR_SIZE) / 2
+
+# Name of the PDF form holding the static parts of every sticker
+STICKER_FRAME_FORM = 'StickerFrame'
+
 # Check for PIL and install if needed
 try:
     from PIL import Image as PILImage
@@ -51,155 +118,387 @@ except ImportError:
     import qrcode
     QR_AVAILABLE = True
 
-# Define paragraph styles - Fixed font sizes as per original
+# pypdf is only needed to merge the PDFs rendered by worker processes
+try:
+    from pypdf import PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+# Optional faster Excel reader - pandas only supports engine='calamine' from 2.2 on
+try:
+    import python_calamine
+    CALAMINE_AVAILABLE = tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+# Report the sticker being created only every this many stickers
+STATUS_UPDATE_INTERVAL = 50
+
+# Batches smaller than this are rendered in-process - worker start-up would outweigh the gain
+PARALLEL_MIN_STICKERS = 200
+
+# Upper bound on render worker processes - each one is a fresh interpreter importing streamlit, pandas and reportlab
+PARALLEL_MAX_WORKERS = 4
+
+# Define text styles - Fixed font sizes as per original
 bold_style = ParagraphStyle(name='Bold', fontName='Helvetica-Bold', fontSize=9, alignment=TA_CENTER, leading=10)
 desc_style = ParagraphStyle(name='Desc', fontName='Helvetica', fontSize=7, alignment=TA_LEFT, leading=9)
 qty_style = ParagraphStyle(name='Quantity', fontName='Helvetica', fontSize=8, alignment=TA_CENTER, leading=11)
+STORE_LOC_LABEL_STYLE = ParagraphStyle(name='StoreLoc', fontName='Helvetica-Bold', fontSize=7, alignment=TA_CENTER)
+LINE_LOC_LABEL_STYLE = ParagraphStyle(name='LineLoc', fontName='Helvetica-Bold', fontSize=7, alignment=TA_CENTER)
+QR_PLACEHOLDER_STYLE = ParagraphStyle(name='QRPlaceholder', fontName='Helvetica-Bold', fontSize=10, alignment=TA_CENTER)
+
+HEADER_LABEL_STYLE = ParagraphStyle(name='HeaderLabel', fontName='Helvetica-Bold', fontSize=8, alignment=TA_CENTER)
+STORE_LOC_BOX_STYLE = ParagraphStyle(name='StoreLocBox', fontName='Helvetica-Bold', fontSize=8, alignment=TA_CENTER)
+LINE_LOC_BOX_STYLE = ParagraphStyle(name='LineLocBox', fontName='Helvetica-Bold', fontSize=7, alignment=TA_CENTER)
+
+BORDER_COLOR = colors.Color(0, 0, 0, alpha=0.95)
+
+@functools.lru_cache(maxsize=4096)
+def qr_code_png_bytes(data_string):
+    """Render a QR code for the given data string and return it as PNG bytes (cached per string)"""
+    # Create QR code instance - the image is drawn at 1.5cm, so 2px modules are all the resolution it needs;
+    # keep the 4-module quiet zone the QR spec requires
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=2,
+        border=4,
+    )
+    
+    # Add data
+    qr.add_data(data_string)
+    qr.make(fit=True)
+    
+    # Create QR code image
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+    
+    # Convert PIL image to bytes that reportlab can use - PNG is lossless, so use the fastest zlib level
+    img_buffer = BytesIO()
+    qr_img.save(img_buffer, format='PNG', compress_level=1)
+    return img_buffer.getvalue()
+
+def generate_qr_code(data_string, errors=None):
+    """Generate a QR code from the given data string.
 
-def generate_qr_code(data_string):
-    """Generate a QR code from the given data string"""
+    Failures are shown with st.error, or appended to errors when given (worker
+    processes have no Streamlit context to report into).
+    """
     try:
-        # Create QR code instance
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=10,
-            border=4,
-        )
-        
-        # Add data
-        qr.add_data(data_string)
-        qr.make(fit=True)
-        
-        # Create QR code image
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert PIL image to bytes that reportlab can use
-        img_buffer = BytesIO()
-        qr_img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
+        # ReportLab consumes the stream, so wrap the cached bytes in a fresh buffer each time
+        img_buffer = BytesIO(qr_code_png_bytes(data_string))
         
-        # Create a QR code image with fixed size
-        return Image(img_buffer, width=1.5*cm, height=1.5*cm)
+        # Hand the PNG straight to the canvas - no flowable wrapping needed
+        return ImageReader(img_buffer)
     except Exception as e:
-        st.error(f"Error generating QR code: {e}")
+        message = f"Error generating QR code: {e}"
+        if errors is not None:
+            errors.append(message)
+        else:
+            st.error(message)
         return None
 
-def find_column(df, keywords):
-    """Find a column in the DataFrame that matches any of the keywords (case-insensitive)"""
-    cols = df.columns.tolist()
+def read_uploaded_file(uploaded_file):
+    """Read an uploaded Excel or CSV file, using the calamine engine for Excel when available"""
+    # CSV stays on the C engine - pyarrow would turn date-like text into timestamps on the sticker
+    if uploaded_file.name.lower().endswith('.csv'):
+        return pd.read_csv(uploaded_file)
+    if CALAMINE_AVAILABLE:
+        return pd.read_excel(uploaded_file, engine='calamine')
+    return pd.read_excel(uploaded_file)
+
+def uppercase_columns(columns):
+    """Map upper-cased column names to the original names, keeping the first of any case-insensitive duplicates"""
+    upper_to_orig = {}
+    for col in columns:
+        if isinstance(col, str):
+            upper_to_orig.setdefault(col.upper(), col)
+    return upper_to_orig
+
+def find_column(upper_to_orig, keywords):
+    """Find a column that matches any of the keywords (case-insensitive), given uppercase_columns() of the column names"""
     for keyword in keywords:
-        for col in cols:
-            if isinstance(col, str) and keyword.upper() in col.upper():
+        keyword = keyword.upper()
+        for upper_col, col in upper_to_orig.items():
+            if keyword in upper_col:
                 return col
     return None
 
-def extract_line_location_components(row, columns):
-    """Extract components for Line Location (L.LOC) from specific columns"""
-    components = [''] * 7
-    
-    # Extract values from respective columns
-    if columns['model'] and columns['model'] in row:
-        components[0] = str(row[columns['model']]) if pd.notna(row[columns['model']]) else ""
-    
-    if columns['station_no'] and columns['station_no'] in row:
-        components[1] = str(row[columns['station_no']]) if pd.notna(row[columns['station_no']]) else ""
-    
-    if columns['rack'] and columns['rack'] in row:
-        components[2] = str(row[columns['rack']]) if pd.notna(row[columns['rack']]) else ""
-    
-    # Extract first digit from separate column
-    if columns['rack_no_1st'] and columns['rack_no_1st'] in row:
-        components[3] = str(row[columns['rack_no_1st']]) if pd.notna(row[columns['rack_no_1st']]) else ""
-    
-    # Extract second digit from separate column
-    if columns['rack_no_2nd'] and columns['rack_no_2nd'] in row:
-        components[4] = str(row[columns['rack_no_2nd']]) if pd.notna(row[columns['rack_no_2nd']]) else ""
-    
-    if columns['level'] and columns['level'] in row:
-        components[5] = str(row[columns['level']]) if pd.notna(row[columns['level']]) else ""
-    
-    if columns['cell'] and columns['cell'] in row:
-        components[6] = str(row[columns['cell']]) if pd.notna(row[columns['cell']]) else ""
-    
-    return components
+def column_strings(df, col, keep_missing=False):
+    """Return a column as an array of strings, with missing values as empty strings.
+
+    With keep_missing=True missing values are stringified as-is (e.g. "nan").
+    A column that was not found yields an array of empty strings.
+    """
+    if col is None:
+        return np.full(len(df), "", dtype=object)
+    # Stringify through numpy so every dtype (datetime, nullable, Arrow) goes through plain str()
+    values = df.iloc[:, df.columns.tolist().index(col)].to_numpy(dtype=object)
+    strings = values.astype(str)
+    if not keep_missing:
+        strings[pd.isna(values)] = ""
+    return strings
+
+def truncate_strings(values, max_chars):
+    """Cut strings longer than max_chars down to max_chars followed by '...'"""
+    values = pd.Series(values, dtype=object)
+    return np.where(values.str.len() > max_chars, values.str[:max_chars] + "...", values)
+
+def extract_line_location_components(df, columns):
+    """Extract the 7 components for Line Location (L.LOC) from specific columns, one row per sticker"""
+    return np.column_stack([
+        column_strings(df, columns['model']),
+        column_strings(df, columns['station_no']),
+        column_strings(df, columns['rack']),
+        # First and second rack digits come from separate columns
+        column_strings(df, columns['rack_no_1st']),
+        column_strings(df, columns['rack_no_2nd']),
+        column_strings(df, columns['level']),
+        column_strings(df, columns['cell']),
+    ])
+
+def extract_store_location_components(df, columns):
+    """Extract the 7 components for Store Location (S.LOC) from ABB columns, one row per sticker"""
+    return np.column_stack([
+        column_strings(df, columns['abb_zone']),
+        column_strings(df, columns['abb_location']),
+        column_strings(df, columns['abb_floor']),
+        column_strings(df, columns['abb_rack_no']),
+        column_strings(df, columns['abb_level_in_rack']),
+        column_strings(df, columns['abb_cell']),
+        column_strings(df, columns['abb_no']),
+    ])
+
+def join_location_parts(location_block):
+    """Join the 7 location components of every row with ' | ', as written into the QR code"""
+    joined = pd.Series(location_block[:, 0], dtype=object)
+    for i in range(1, location_block.shape[1]):
+        joined = joined + " | " + location_block[:, i]
+    return joined
+
+def wrap_text(text, font_name, font_size, width):
+    """Wrap text to width at spaces, breaking words that are still too wide by character (like Paragraph)"""
+    lines = []
+    for line in simpleSplit(text, font_name, font_size, width):
+        while stringWidth(line, font_name, font_size) > width and len(line) > 1:
+            # Longest prefix that fits, always at least one character so the loop progresses
+            cut = 1
+            while cut < len(line) and stringWidth(line[:cut + 1], font_name, font_size) <= width:
+                cut += 1
+            lines.append(line[:cut])
+            line = line[cut:]
+        lines.append(line)
+    return lines
+
+def draw_cell_text(canvas, text, style, cell, wrap=False):
+    """Draw text vertically centred in a cell, aligned as per the style and optionally wrapped to its width"""
+    left, right, middle = cell
+    lines = wrap_text(text, style.fontName, style.fontSize, right - left) if wrap else [text]
+    baseline = middle + (len(lines) - 1) * style.leading / 2 - style.fontSize * 0.35
+    canvas.setFont(style.fontName, style.fontSize)
+    for line in lines:
+        if style.alignment == TA_CENTER:
+            canvas.drawCentredString((left + right) / 2, baseline, line)
+        else:
+            canvas.drawString(left, baseline, line)
+        baseline -= style.leading
+
+def draw_sticker_frame(canvas):
+    """Draw the parts shared by every sticker: border box, grid lines and row labels"""
+    x = STICKER_COL_X
+    y = STICKER_ROW_Y
+
+    # Border box around the content
+    canvas.setLineWidth(1.5)
+    canvas.rect(CONTENT_BOX_LEFT, CONTENT_BOX_TOP - CONTENT_BOX_HEIGHT, CONTENT_BOX_WIDTH, CONTENT_BOX_HEIGHT)
+
+    # Grid - the label column and outer edges run the full height, location box dividers only the location rows
+    canvas.setLineWidth(1.0)
+    for row_y in y[:6]:
+        canvas.line(x[0], row_y, x[8], row_y)
+    for col_x in (x[0], x[1], x[8]):
+        canvas.line(col_x, y[0], col_x, y[5])
+    for col_x in x[2:8]:
+        canvas.line(col_x, y[3], col_x, y[5])
+
+    draw_cell_text(canvas, "Part No", HEADER_LABEL_STYLE, PART_NO_LABEL_CELL)
+    draw_cell_text(canvas, "Desc", HEADER_LABEL_STYLE, DESC_LABEL_CELL)
+    draw_cell_text(canvas, "Q/B", HEADER_LABEL_STYLE, QTY_LABEL_CELL)
+    draw_cell_text(canvas, "S.LOC", STORE_LOC_LABEL_STYLE, STORE_LOC_LABEL_CELL)
+    draw_cell_text(canvas, "L.LOC", LINE_LOC_LABEL_STYLE, LINE_LOC_LABEL_CELL)
+
+def make_sticker_drawer(canvas):
+    """Build the per-sticker drawing function for a canvas.
+
+    The sticker geometry never changes, so text anchors and the canvas methods are
+    resolved once here and bound into the returned closure.
+    """
+    set_stroke_color = canvas.setStrokeColor
+    do_form = canvas.doForm
+    set_font = canvas.setFont
+    draw_centred = canvas.drawCentredString
+    draw_image = canvas.drawImage
+
+    def single_line_anchor(cell, style):
+        left, right, middle = cell
+        return (left + right) / 2, middle - style.fontSize * 0.35
+
+    qty_x, qty_y = single_line_anchor(QTY_CELL, qty_style)
+    store_anchors = tuple(single_line_anchor(cell, STORE_LOC_BOX_STYLE) for cell in STORE_LOC_CELLS)
+    line_anchors = tuple(single_line_anchor(cell, LINE_LOC_BOX_STYLE) for cell in LINE_LOC_CELLS)
+
+    def draw_sticker(part_no, desc_label, qty_bin, line_location_parts, store_location_parts, qr_image):
+        # The stroke colour has transparency, which forms cannot carry - set it on the page instead
+        set_stroke_color(BORDER_COLOR)
+        do_form(STICKER_FRAME_FORM)
+
+        # Part number and description may wrap, so they still go through the generic helper
+        draw_cell_text(canvas, part_no, bold_style, PART_NO_CELL, wrap=True)
+        draw_cell_text(canvas, desc_label, desc_style, DESC_CELL, wrap=True)
+
+        set_font(qty_style.fontName, qty_style.fontSize)
+        draw_centred(qty_x, qty_y, qty_bin)
+
+        set_font(STORE_LOC_BOX_STYLE.fontName, STORE_LOC_BOX_STYLE.fontSize)
+        for (x, y), part in zip(store_anchors, store_location_parts):
+            draw_centred(x, y, part)
+
+        set_font(LINE_LOC_BOX_STYLE.fontName, LINE_LOC_BOX_STYLE.fontSize)
+        for (x, y), part in zip(line_anchors, line_location_parts):
+            draw_centred(x, y, part)
 
-def extract_store_location_components(row, columns):
-    """Extract components for Store Location (S.LOC) from ABB columns"""
-    components = [''] * 7
-    
-    # Extract values from ABB columns
-    if columns['abb_zone'] and columns['abb_zone'] in row:
-        components[0] = str(row[columns['abb_zone']]) if pd.notna(row[columns['abb_zone']]) else ""
-    
-    if columns['abb_location'] and columns['abb_location'] in row:
-        components[1] = str(row[columns['abb_location']]) if pd.notna(row[columns['abb_location']]) else ""
-    
-    if columns['abb_floor'] and columns['abb_floor'] in row:
-        components[2] = str(row[columns['abb_floor']]) if pd.notna(row[columns['abb_floor']]) else ""
-    
-    if columns['abb_rack_no'] and columns['abb_rack_no'] in row:
-        components[3] = str(row[columns['abb_rack_no']]) if pd.notna(row[columns['abb_rack_no']]) else ""
-    
-    if columns['abb_level_in_rack'] and columns['abb_level_in_rack'] in row:
-        components[4] = str(row[columns['abb_level_in_rack']]) if pd.notna(row[columns['abb_level_in_rack']]) else ""
-    
-    if columns['abb_cell'] and columns['abb_cell'] in row:
-        components[5] = str(row[columns['abb_cell']]) if pd.notna(row[columns['abb_cell']]) else ""
-    
-    if columns['abb_no'] and columns['abb_no'] in row:
-        components[6] = str(row[columns['abb_no']]) if pd.notna(row[columns['abb_no']]) else ""
-    
-    return components
+        if qr_image:
+            draw_image(qr_image, QR_X, QR_Y, QR_SIZE, QR_SIZE, preserveAspectRatio=False)
+        else:
+            draw_cell_text(canvas, "QR", QR_PLACEHOLDER_STYLE, QR_CELL)
 
-def generate_sticker_labels(df, progress_bar=None, status_container=None):
-    """Generate sticker labels with QR code from DataFrame"""
-    
-    # Create a function to draw the border box around content
-    def draw_border(canvas, doc):
-        canvas.saveState()
-        x_offset = CONTENT_LEFT_OFFSET
-        y_offset = STICKER_HEIGHT - CONTENT_BOX_HEIGHT - 0.8*cm
-        canvas.setStrokeColor(colors.Color(0, 0, 0, alpha=0.95))
-        canvas.setLineWidth(1.5)
-        canvas.rect(
-            x_offset,
-            y_offset,
-            CONTENT_BOX_WIDTH,
-            CONTENT_BOX_HEIGHT
-        )
-        canvas.restoreState()
+    return draw_sticker
+
+def render_sticker_pdf(stickers, output, progress_bar=None, status_container=None, total_rows=None,
+                       qr_errors=None):
+    """Render one sticker per page into output (a path or file-like object).
+
+    stickers may be any iterable - pages are written as it is consumed, so pass
+    total_rows when it has no len(). QR failures are collected in qr_errors when given.
+    """
+    c = Canvas(output, pagesize=STICKER_PAGESIZE)
+
+    # The border, grid and labels are identical on every page - draw them once as a reusable form
+    c.beginForm(STICKER_FRAME_FORM)
+    draw_sticker_frame(c)
+    c.endForm()
+
+    draw_sticker = make_sticker_drawer(c)
+    qr_images = {}
+
+    # Process each row as a single sticker
+    if total_rows is None:
+        total_rows = len(stickers)
+    last_percent = None
+    for index, (part_no, desc_label, qty_bin, line_location_parts, store_location_parts, qr_data) in enumerate(stickers):
+        # Update progress - only on whole-percent steps, each update is a round trip to the browser
+        percent = (index + 1) * 100 // total_rows
+        if progress_bar and percent != last_percent:
+            progress_bar.progress(percent / 100)
+        last_percent = percent
         
+        if status_container and (index % STATUS_UPDATE_INTERVAL == 0 or index == total_rows - 1):
+            status_container.write(f"Creating sticker {index+1} of {total_rows}")
+
+        # Generate QR code with part information - once per distinct payload, so repeated
+        # bins reuse the same ImageReader and the PDF embeds the image a single time
+        if qr_data not in qr_images:
+            qr_images[qr_data] = generate_qr_code(qr_data, qr_errors)
+        qr_image = qr_images[qr_data]
+
+        draw_sticker(part_no, desc_label, qty_bin, line_location_parts, store_location_parts, qr_image)
+
+        # One sticker per page
+        c.showPage()
+
+    c.save()
+
+def parallel_worker_count():
+    """Number of render workers to use - the CPUs this process may run on, capped at PARALLEL_MAX_WORKERS"""
+    # sched_getaffinity respects affinity and cpusets; cpu_count reports every CPU on the host
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    return min(cpus, PARALLEL_MAX_WORKERS)
+
+def render_sticker_chunk(stickers):
+    """Render a chunk of stickers in a worker process and return the PDF bytes and any QR errors"""
+    buffer = BytesIO()
+    qr_errors = []
+    render_sticker_pdf(stickers, buffer, qr_errors=qr_errors)
+    return buffer.getvalue(), qr_errors
+
+def render_sticker_pdf_parallel(stickers, output, progress_bar=None):
+    """Render stickers across worker processes and merge the chunk PDFs in order into output"""
+    workers = min(parallel_worker_count(), len(stickers))
+    chunk_size = -(-len(stickers) // workers)
+    chunks = [stickers[i:i + chunk_size] for i in range(0, len(stickers), chunk_size)]
+
+    chunk_pdfs = [None] * len(chunks)
+    # Spawn fresh interpreters - forking Streamlit's multi-threaded server process can deadlock the child
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(render_sticker_chunk, chunk): i for i, chunk in enumerate(chunks)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            chunk_pdfs[futures[future]], qr_errors = future.result()
+            # Workers cannot reach the Streamlit session, so surface their QR failures here
+            for message in qr_errors:
+                st.error(message)
+            if progress_bar:
+                progress_bar.progress(done / len(chunks))
+
+    writer = PdfWriter()
+    for chunk_pdf in chunk_pdfs:
+        writer.append(BytesIO(chunk_pdf))
+    writer.write(output)
+
+@st.cache_data
+def resolve_columns(columns):
+    """Find the part, description, quantity and location columns among the given column names"""
     # Identify columns (case-insensitive) - Updated for your exact column names
-    original_columns = df.columns.tolist()
+    upper_to_orig = uppercase_columns(columns)
     
     # Find basic columns
-    part_no_col = find_column(df, ['PART NO', 'PARTNO', 'PART', 'PART_NO', 'PART#'])
-    desc_col = find_column(df, ['PART DESC', 'DESC', 'DESCRIPTION', 'NAME', 'PRODUCT_NAME'])
-    qty_bin_col = find_column(df, ['QTY/BIN', 'QTY_BIN', 'QTYBIN', 'QTY', 'QUANTITY'])
+    part_no_col = find_column(upper_to_orig, ['PART NO', 'PARTNO', 'PART', 'PART_NO', 'PART#'])
+    desc_col = find_column(upper_to_orig, ['PART DESC', 'DESC', 'DESCRIPTION', 'NAME', 'PRODUCT_NAME'])
+    qty_bin_col = find_column(upper_to_orig, ['QTY/BIN', 'QTY_BIN', 'QTYBIN', 'QTY', 'QUANTITY'])
     
     # Find Line Location columns - Updated for your exact column names
     line_location_columns = {
-        'model': find_column(df, ['MODEL', 'BUS MODEL', 'BUS_MODEL', 'BUSMODEL', 'BUS']),
-        'station_no': find_column(df, ['STATION NO', 'STATION_NO', 'STATIONNO', 'STATION']),
-        'rack': find_column(df, ['RACK']),
-        'rack_no_1st': find_column(df, ['RACK NO. (1ST DIGIT)', 'RACK NO (1ST DIGIT)', 'RACK_NO_1ST', 'RACK NO 1ST']),
-        'rack_no_2nd': find_column(df, ['RACK NO. (2ND DIGIT)', 'RACK NO (2ND DIGIT)', 'RACK_NO_2ND', 'RACK NO 2ND']),
-        'level': find_column(df, ['LEVEL']),
-        'cell': find_column(df, ['CELL'])
+        'model': find_column(upper_to_orig, ['MODEL', 'BUS MODEL', 'BUS_MODEL', 'BUSMODEL', 'BUS']),
+        'station_no': find_column(upper_to_orig, ['STATION NO', 'STATION_NO', 'STATIONNO', 'STATION']),
+        'rack': find_column(upper_to_orig, ['RACK']),
+        'rack_no_1st': find_column(upper_to_orig, ['RACK NO. (1ST DIGIT)', 'RACK NO (1ST DIGIT)', 'RACK_NO_1ST', 'RACK NO 1ST']),
+        'rack_no_2nd': find_column(upper_to_orig, ['RACK NO. (2ND DIGIT)', 'RACK NO (2ND DIGIT)', 'RACK_NO_2ND', 'RACK NO 2ND']),
+        'level': find_column(upper_to_orig, ['LEVEL']),
+        'cell': find_column(upper_to_orig, ['CELL'])
     }
     
     # Find Store Location (ABB) columns - Updated for your exact column names
     store_location_columns = {
-        'abb_zone': find_column(df, ['ABB FOR ZONE', 'ABB_FOR_ZONE', 'ABB ZONE', 'ABB_ZONE', 'ABBZONE', 'ZONE']),
-        'abb_location': find_column(df, ['ABB FOR LOCATION', 'ABB_FOR_LOCATION', 'ABB LOCATION', 'ABB_LOCATION', 'ABBLOCATION']),
-        'abb_floor': find_column(df, ['ABB FOR FLOOR', 'ABB_FOR_FLOOR', 'ABB FLOOR', 'ABB_FLOOR', 'ABBFLOOR', 'FLOOR']),
-        'abb_rack_no': find_column(df, ['ABB FOR RACK NO', 'ABB_FOR_RACK_NO', 'ABB RACK NO', 'ABB_RACK_NO', 'ABBRACKNO', 'ABB RACK']),
-        'abb_level_in_rack': find_column(df, ['ABB FOR LEVEL IN RACK', 'ABB_FOR_LEVEL_IN_RACK', 'ABB LEVEL IN RACK', 'ABB_LEVEL_IN_RACK', 'ABBLEVELINRACK', 'ABB LEVEL']),
-        'abb_cell': find_column(df, ['ABB FOR CELL', 'ABB_FOR_CELL', 'ABB CELL', 'ABB_CELL', 'ABBCELL']),
-        'abb_no': find_column(df, ['ABB FOR NO', 'ABB_FOR_NO', 'ABB NO', 'ABB_NO', 'ABBNO', 'ABB NUMBER'])
+        'abb_zone': find_column(upper_to_orig, ['ABB FOR ZONE', 'ABB_FOR_ZONE', 'ABB ZONE', 'ABB_ZONE', 'ABBZONE', 'ZONE']),
+        'abb_location': find_column(upper_to_orig, ['ABB FOR LOCATION', 'ABB_FOR_LOCATION', 'ABB LOCATION', 'ABB_LOCATION', 'ABBLOCATION']),
+        'abb_floor': find_column(upper_to_orig, ['ABB FOR FLOOR', 'ABB_FOR_FLOOR', 'ABB FLOOR', 'ABB_FLOOR', 'ABBFLOOR', 'FLOOR']),
+        'abb_rack_no': find_column(upper_to_orig, ['ABB FOR RACK NO', 'ABB_FOR_RACK_NO', 'ABB RACK NO', 'ABB_RACK_NO', 'ABBRACKNO', 'ABB RACK']),
+        'abb_level_in_rack': find_column(upper_to_orig, ['ABB FOR LEVEL IN RACK', 'ABB_FOR_LEVEL_IN_RACK', 'ABB LEVEL IN RACK', 'ABB_LEVEL_IN_RACK', 'ABBLEVELINRACK', 'ABB LEVEL']),
+        'abb_cell': find_column(upper_to_orig, ['ABB FOR CELL', 'ABB_FOR_CELL', 'ABB CELL', 'ABB_CELL', 'ABBCELL']),
+        'abb_no': find_column(upper_to_orig, ['ABB FOR NO', 'ABB_FOR_NO', 'ABB NO', 'ABB_NO', 'ABBNO', 'ABB NUMBER'])
     }
 
+    return part_no_col, desc_col, qty_bin_col, line_location_columns, store_location_columns
+
+def generate_sticker_labels(df, progress_bar=None, status_container=None):
+    """Generate sticker labels with QR code from DataFrame and return the PDF bytes (None on failure)"""
+    
+    # Identify columns (case-insensitive) - cached per set of column names
+    part_no_col, desc_col, qty_bin_col, line_location_columns, store_location_columns = resolve_columns(tuple(df.columns))
+
     if status_container:
         status_container.write("**Using columns:**")
         status_container.write(f"- Part No: {part_no_col}")
@@ -212,214 +511,47 @@ def generate_sticker_labels(df, progress_bar=None, status_container=None):
         for key, col in store_location_columns.items():
             status_container.write(f"- {key}: {col}")
 
-    # Create temporary file for PDF output
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-    temp_path = temp_file.name
-    temp_file.close()
-
-    # Create document with minimal margins
-    doc = SimpleDocTemplate(temp_path, pagesize=STICKER_PAGESIZE,
-                          topMargin=0.1*cm, bottomMargin=0.1*cm,
-                          leftMargin=0.1*cm, rightMargin=0.1*cm)
-
-    all_elements = []
-
-    # Process each row as a single sticker
+    # Convert every column we need to strings in one pass before building stickers
+    part_arr = column_strings(df, part_no_col, keep_missing=True)
+    desc_arr = column_strings(df, desc_col, keep_missing=True)
+    desc_label_arr = truncate_strings(desc_arr, DESC_MAX_CHARS)
+    qty_arr = column_strings(df, qty_bin_col)
+    line_location_block = extract_line_location_components(df, line_location_columns)
+    store_location_block = extract_store_location_components(df, store_location_columns)
     total_rows = len(df)
-    for index, row in df.iterrows():
-        # Update progress
-        if progress_bar:
-            progress_bar.progress((index + 1) / total_rows)
-        
-        if status_container:
-            status_container.write(f"Creating sticker {index+1} of {total_rows}")
-        
-        elements = []
 
-        # Extract basic data
-        part_no = str(row[part_no_col]) if part_no_col and part_no_col in row else ""
-        desc = str(row[desc_col]) if desc_col and desc_col in row else ""
-        qty_bin = str(row[qty_bin_col]) if qty_bin_col and qty_bin_col in row and pd.notna(row[qty_bin_col]) else ""
-        
-        # Extract Line Location components
-        line_location_parts = extract_line_location_components(row, line_location_columns)
-        
-        # Extract Store Location components
-        store_location_parts = extract_store_location_components(row, store_location_columns)
+    # Build every QR payload up front so the render loop never touches pandas
+    qr_data_arr = ("Part No: " + pd.Series(part_arr, dtype=object)
+                   + "\nDescription: " + desc_arr
+                   + "\nQTY/BIN: " + qty_arr
+                   + "\nLine Location: " + join_location_parts(line_location_block)
+                   + "\nStore Location: " + join_location_parts(store_location_block)).to_numpy()
+    sticker_columns = (part_arr, desc_label_arr, qty_arr,
+                       line_location_block.tolist(), store_location_block.tolist(), qr_data_arr)
 
-        # Generate QR code with part information
-        qr_data = f"Part No: {part_no}\nDescription: {desc}\nQTY/BIN: {qty_bin}\n"
-        qr_data += f"Line Location: {' | '.join(line_location_parts)}\n"
-        qr_data += f"Store Location: {' | '.join(store_location_parts)}"
-        
-        qr_image = generate_qr_code(qr_data)
-        
-        # Define row heights - Fixed sizes as per original
-        header_row_height = 0.6*cm
-        desc_row_height = 0.8*cm
-        qty_row_height = 0.5*cm
-        location_row_height = 0.5*cm
-
-        # Fixed dimensions
-        qr_width = 1.5*cm  
-        main_content_width = CONTENT_BOX_WIDTH - qr_width
-
-        # Main table data - Fixed column widths
-        header_col_width = main_content_width * 0.22
-        content_col_width = main_content_width * 0.71
-        
-        main_table_data = [
-            ["Part No", Paragraph(f"{part_no}", bold_style)],
-            ["Desc", Paragraph(desc[:30] + "..." if len(desc) > 30 else desc, desc_style)],
-            ["Q/B", Paragraph(str(qty_bin), qty_style)]
-        ]
-
-        # Create main table with fixed column widths
-        main_table = Table(main_table_data,
-                         colWidths=[header_col_width, content_col_width],
-                         rowHeights=[header_row_height, desc_row_height, qty_row_height])
-
-        main_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1.0, colors.Color(0, 0, 0, alpha=0.95)),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (0, -1), 8),
-        ]))
-
-        # Store Location section - Fixed layout
-        store_loc_label = Paragraph("S.LOC", ParagraphStyle(
-            name='StoreLoc', fontName='Helvetica-Bold', fontSize=7, alignment=TA_CENTER
-        ))
-
-        # Fixed width for the inner columns
-        inner_table_width = content_col_width
-        
-        # Calculate column widths based on fixed proportions 
-        total_proportion = sum(COLUMN_WIDTH_PROPORTIONS)
-        inner_col_widths = [w * inner_table_width / total_proportion for w in COLUMN_WIDTH_PROPORTIONS]
-
-        store_loc_inner_table = Table(
-            [store_location_parts],
-            colWidths=inner_col_widths,
-            rowHeights=[location_row_height]
-        )
+    # Build the PDF in memory - the bytes go straight to the download button
+    pdf_buffer = BytesIO()
 
-        store_loc_inner_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1.0, colors.Color(0, 0, 0, alpha=0.95)),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ]))
-
-        store_loc_table = Table(
-            [[store_loc_label, store_loc_inner_table]],
-            colWidths=[header_col_width, inner_table_width],
-            rowHeights=[location_row_height]
-        )
-
-        store_loc_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1.0, colors.Color(0, 0, 0, alpha=0.95)),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-
-        # Line Location section - Fixed layout
-        line_loc_label = Paragraph("L.LOC", ParagraphStyle(
-            name='LineLoc', fontName='Helvetica-Bold', fontSize=7, alignment=TA_CENTER
-        ))
-        
-        # Create the inner table for line location parts using the same fixed widths
-        line_loc_inner_table = Table(
-            [line_location_parts],
-            colWidths=inner_col_widths,
-            rowHeights=[location_row_height]
-        )
-        
-        line_loc_inner_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1.0, colors.Color(0, 0, 0, alpha=0.95)),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 7)
-        ]))
-        
-        # Wrap the label and the inner table in a containing table
-        line_loc_table = Table(
-            [[line_loc_label, line_loc_inner_table]],
-            colWidths=[header_col_width, inner_table_width],
-            rowHeights=[location_row_height]
-        )
-
-        line_loc_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1.0, colors.Color(0, 0, 0, alpha=0.95)),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-
-        # Create main content table (combining all the content tables vertically)
-        total_main_height = header_row_height + desc_row_height + qty_row_height
-        
-        main_content_table = Table(
-            [[main_table], [store_loc_table], [line_loc_table]],
-            colWidths=[main_content_width],
-            rowHeights=[total_main_height, location_row_height, location_row_height]
-        )
-
-        main_content_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-
-        # QR code table - Fixed positioning
-        if qr_image:
-            qr_table = Table(
-                [[qr_image]],
-                colWidths=[qr_width], 
-                rowHeights=[CONTENT_BOX_HEIGHT]
-            )
-        else:
-            qr_table = Table(
-                [[Paragraph("QR", ParagraphStyle(
-                    name='QRPlaceholder', fontName='Helvetica-Bold', fontSize=10, alignment=TA_CENTER
-                ))]],
-                colWidths=[qr_width],
-                rowHeights=[CONTENT_BOX_HEIGHT]
-            )
-
-        qr_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-
-        # Final layout with fixed dimensions
-        final_table = Table(
-            [[main_content_table, qr_table]],
-            colWidths=[main_content_width, qr_width],
-            rowHeights=[CONTENT_BOX_HEIGHT]
-        )
-
-        final_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-
-        # Fixed spacer
-        elements.append(Spacer(1, 0.3*cm))
-        elements.append(final_table)
-
-        # Add all elements for this sticker to the document
-        all_elements.extend(elements)
-
-        # Add page break after each sticker (except the last one)
-        if index < len(df) - 1:
-            all_elements.append(PageBreak())
-
-    # Build the document
+    # Build the document - large batches are split across processes when pypdf is available to merge them
     try:
-        doc.build(all_elements, onFirstPage=draw_border, onLaterPages=draw_border)
+        use_parallel = PYPDF_AVAILABLE and total_rows >= PARALLEL_MIN_STICKERS and parallel_worker_count() > 1
+        if use_parallel:
+            try:
+                # Workers need picklable, sliceable chunks, so only this path materializes the rows
+                stickers = list(zip(*sticker_columns))
+                render_sticker_pdf_parallel(stickers, pdf_buffer, progress_bar)
+            except (BrokenProcessPool, pickle.PicklingError) as e:
+                # Worker processes could not be started (e.g. the script module is not importable)
+                if status_container:
+                    status_container.warning(f"Parallel rendering unavailable, rendering sequentially: {e}")
+                use_parallel = False
+        if not use_parallel:
+            # Stream rows straight from the column arrays onto the canvas
+            stickers = zip(*sticker_columns)
+            render_sticker_pdf(stickers, pdf_buffer, progress_bar, status_container, total_rows)
         if status_container:
             status_container.success("PDF generated successfully!")
-        return temp_path
+        return pdf_buffer.getvalue()
     except Exception as e:
         if status_container:
             status_container.error(f"Error building PDF: {e}")
@@ -514,10 +646,7 @@ def main():
     if uploaded_file is not None:
         try:
             # Read the file
-            if uploaded_file.name.lower().endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            df = read_uploaded_file(uploaded_file)
             
             st.subheader("📊 Data Preview")
             st.write(f"**Total rows:** {len(df)}")
@@ -534,16 +663,9 @@ def main():
                     status_container = st.empty()
                     
                     # Generate the PDF
-                    pdf_path = generate_sticker_labels(df, progress_bar, status_container)
+                    pdf_data = generate_sticker_labels(df, progress_bar, status_container)
                     
-                    if pdf_path:
-                        # Read the generated PDF
-                        with open(pdf_path, 'rb') as pdf_file:
-                            pdf_data = pdf_file.read()
-                        
-                        # Clean up temporary file
-                        os.unlink(pdf_path)
-                        
+                    if pdf_data:
                         # Download button
                         st.download_button(
                             label="📥 Download PDF",